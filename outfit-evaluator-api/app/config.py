@@ -2,11 +2,21 @@
 Configuration settings for the Outfit Evaluator API
 """
 
+import functools
+import math
 import os
+import re
+import sys
 from pathlib import Path
+from types import MappingProxyType
 
-# Base directory
-BASE_DIR = Path(__file__).parent.parent
+from typing import Final
+
+import numpy as np
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+
+# Base directory (resolved once; the realpath syscall happens at import only)
+BASE_DIR: Final[Path] = Path(__file__).resolve().parent.parent
 
 # API Configuration
 API_TITLE = "AI Outfit Evaluator API"
@@ -19,22 +29,43 @@ API_PORT = 8000
 MODEL_PATH = BASE_DIR / "Models" / "best.pt"
 UPLOAD_DIR = BASE_DIR / "uploads"
 
+# Absolute str form, computed once for paths handed to libraries that
+# want plain strings (already absolute because BASE_DIR is resolved)
+MODEL_PATH_STR = os.fspath(MODEL_PATH)
+
 # API Keys
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "your-gemini-api-key-here")
+@functools.lru_cache(maxsize=1)
+def get_gemini_api_key() -> str:
+    """Read the Gemini API key from the environment on first use.
+
+    Raises RuntimeError immediately when the key is missing or still the
+    placeholder, so misconfiguration surfaces at startup instead of as a
+    confusing traceback deep inside the Gemini client on first request.
+    Memoized so the environment scan happens at most once per process;
+    call get_gemini_api_key.cache_clear() after rotating the key.
+    """
+    key = os.getenv("GEMINI_API_KEY", "")
+    if not key or key == "your-gemini-api-key-here":
+        raise RuntimeError(
+            "GEMINI_API_KEY is not configured. Set the environment variable "
+            "to enable AI suggestions."
+        )
+    return key
 
 # Model Settings
 YOLO_MODEL_NAME = "best.pt"
 CLIP_MODEL_NAME = "ViT-B/32"
 GEMINI_MODEL_NAME = "gemini-2.5-flash"
 
-# YOLO Class Names
-CLASS_NAMES = [
-    'sunglass', 'hat', 'jacket', 'shirt', 
+# YOLO Class Names (immutable; order matches the trained model's class ids)
+# Interned so label comparisons across modules hit the identity fast path
+CLASS_NAMES = tuple(sys.intern(s) for s in (
+    'sunglass', 'hat', 'jacket', 'shirt',
     'pants', 'shorts', 'skirt', 'dress', 'bag', 'shoe'
-]
+))
 
 # Occasion Mappings
-OCCASIONS = {
+OCCASIONS = MappingProxyType({
     'job_interview': 'professional job interview',
     'date_night': 'romantic date night',
     'casual_hangout': 'casual social gathering',
@@ -43,28 +74,115 @@ OCCASIONS = {
     'beach_vacation': 'beach or vacation setting',
     'night_out': 'night out with friends',
     'business_casual': 'business casual workplace'
-}
+})
+
+# Frozen key view for fast membership checks in request validation
+OCCASION_KEYS = frozenset(OCCASIONS)
 
 # Scoring Weights
-SCORING_WEIGHTS = {
+SCORING_WEIGHTS = MappingProxyType({
     'clip_contextual': 0.6,
     'color_harmony': 0.2,
     'item_completeness': 0.1,
     'style_coherence': 0.1
-}
+})
+
+# Catch weight typos once at import instead of producing silently wrong scores
+assert all(w >= 0 for w in SCORING_WEIGHTS.values()), \
+    "SCORING_WEIGHTS values must be nonnegative"
+assert math.isclose(sum(SCORING_WEIGHTS.values()), 1.0, abs_tol=1e-9), \
+    f"SCORING_WEIGHTS must sum to 1.0, got {sum(SCORING_WEIGHTS.values())}"
+
+# Fixed component order + weight vector so scoring is a single dot product
+SCORE_COMPONENT_ORDER = (
+    'clip_contextual', 'color_harmony', 'item_completeness', 'style_coherence'
+)
+SCORING_WEIGHTS_VEC = np.asarray(
+    [SCORING_WEIGHTS[k] for k in SCORE_COMPONENT_ORDER], dtype=np.float32
+)
 
 # File Upload Settings
-MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp'}
-ALLOWED_MIME_TYPES = {
-    'image/png', 'image/jpeg', 'image/jpg', 
-    'image/gif', 'image/bmp'
-}
+MAX_FILE_SIZE: Final[int] = 10_485_760  # 10MB
+
+
+def check_size(content_length: int) -> bool:
+    """Cheap pre-read guard: is a declared body size acceptable?"""
+    return 0 < content_length <= MAX_FILE_SIZE
+ALLOWED_EXTENSIONS: Final[frozenset] = frozenset(
+    sys.intern(s) for s in ('png', 'jpg', 'jpeg', 'gif', 'bmp')
+)
+ALLOWED_MIME_TYPES: Final[frozenset] = frozenset(
+    sys.intern(s) for s in (
+        'image/png', 'image/jpeg', 'image/jpg',
+        'image/gif', 'image/bmp'
+    )
+)
+
+# Precompiled extension check; kept in sync with ALLOWED_EXTENSIONS
+_EXT_RE = re.compile(r'\.(?:png|jpe?g|gif|bmp)$', re.IGNORECASE)
+
+
+def is_allowed_upload(filename: str, mime: str) -> bool:
+    """Single-call upload validation: allowed MIME type + allowed extension."""
+    return mime in ALLOWED_MIME_TYPES and _EXT_RE.search(filename) is not None
+
+
+# LLM Suggestion Settings
+# Outfits scoring at or above this threshold skip the Gemini round-trip
+# and use the template suggestions: the high-score advice buckets differ
+# little between the LLM and the fallback, so the easy cases don't pay
+# seconds of API latency. Raise above 10 to always call the LLM.
+LLM_SKIP_SCORE_THRESHOLD: Final[float] = float(os.getenv("LLM_SKIP_SCORE", "8"))
 
 # Color Detection Settings
 MAX_COLORS_PER_ITEM = 3
 COLOR_SIMILARITY_THRESHOLD = 40
 
-# Create directories if they don't exist
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-os.makedirs(MODEL_PATH.parent, exist_ok=True)
\ No newline at end of file
+class Settings(BaseModel):
+    """Validated, immutable snapshot of the module-level configuration.
+
+    Construction runs the pydantic validators once; consumers get typed
+    attribute access afterwards via get_settings().
+    """
+    model_config = ConfigDict(frozen=True)
+
+    api_title: str = API_TITLE
+    api_version: str = API_VERSION
+    api_host: str = API_HOST
+    api_port: int = Field(default=API_PORT, ge=1, le=65535)
+    model_path: Path = MODEL_PATH
+    upload_dir: Path = UPLOAD_DIR
+    clip_model_name: str = Field(default=CLIP_MODEL_NAME, min_length=1)
+    gemini_model_name: str = Field(default=GEMINI_MODEL_NAME, min_length=1)
+    class_names: tuple = CLASS_NAMES
+    max_file_size: int = Field(default=MAX_FILE_SIZE, gt=0, le=100 * 1024 * 1024)
+    max_colors_per_item: int = Field(default=MAX_COLORS_PER_ITEM, ge=1, le=10)
+    color_similarity_threshold: int = Field(
+        default=COLOR_SIMILARITY_THRESHOLD, ge=0, le=255
+    )
+    scoring_weights: dict = dict(SCORING_WEIGHTS)
+
+    @model_validator(mode='after')
+    def _validate(self) -> 'Settings':
+        if not self.class_names:
+            raise ValueError("class_names must not be empty")
+        total = sum(self.scoring_weights.values())
+        if abs(total - 1.0) > 1e-6:
+            raise ValueError(f"scoring_weights must sum to 1.0, got {total}")
+        return self
+
+
+@functools.lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Build and validate the Settings singleton on first use."""
+    return Settings()
+
+
+def ensure_runtime_dirs() -> None:
+    """Create the upload and model directories if they don't exist.
+
+    Called once from app startup so importing this module stays free of
+    filesystem side effects (tests, CLI tools, autoreload).
+    """
+    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    MODEL_PATH.parent.mkdir(parents=True, exist_ok=True)
\ No newline at end of file
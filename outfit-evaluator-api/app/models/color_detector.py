@@ -3,42 +3,102 @@ Improved color detection module with better color classification
 """
 
 import cv2
+import logging
 import numpy as np
-import tempfile
-import os
+from functools import lru_cache
+from io import BytesIO
 from typing import List, Dict, Tuple, Optional
 from colorthief import ColorThief
 import colorsys
 
+from app.config import MAX_COLORS_PER_ITEM, COLOR_SIMILARITY_THRESHOLD
+
+# Child of the app logger configured in main.py (queue-backed handlers);
+# per-bbox tracing stays at DEBUG so production runs skip the formatting
+logger = logging.getLogger("outfit_evaluator.colors")
+
+
+# Hue band edges (OpenCV 0-180 scale) and the names of the bands between
+# them; the trailing 'red' covers the wrap-around above 170
+_HUE_EDGES = np.array([11, 26, 36, 86, 96, 126, 146, 170])
+_HUE_NAMES = np.array(
+    ['red', 'orange', 'yellow', 'green', 'cyan', 'blue', 'purple', 'pink', 'red'],
+    dtype=object
+)
+
+
+def classify_hsv_batch(hsv: np.ndarray) -> List[str]:
+    """Classify an (N, 3) array of HSV pixels into color names in one pass
+
+    Vectorized equivalent of the per-color ladder: hue banding via
+    np.digitize plus boolean S/V masks, so N classifications cost a few
+    whole-array operations instead of N Python branch walks.
+    """
+    h = hsv[:, 0].astype(np.int32)
+    s = hsv[:, 1].astype(np.int32)
+    v = hsv[:, 2].astype(np.int32)
+
+    out = _HUE_NAMES[np.digitize(h, _HUE_EDGES)]
+
+    # Overrides in increasing priority, mirroring the ladder order
+    out[v < 60] = 'black'
+    gray = s < 30
+    out[gray] = 'white'
+    out[gray & (v < 200)] = 'light_gray'
+    out[gray & (v < 100)] = 'gray'
+    out[gray & (v < 50)] = 'black'
+
+    return out.tolist()
+
+
 class ColorDetector:
     """Improved color detector with better color classification"""
-    
-    def __init__(self):
+
+    # Color ranges in HSV for better detection. Constant reference data
+    # shared by every instance (the batch classifier's _HUE_EDGES mirror
+    # these bands), so it lives on the class instead of being rebuilt in
+    # each __init__.
+    color_ranges = {
+        # Hue ranges (0-180 in OpenCV)
+        'red': [(0, 10), (170, 180)],  # Red wraps around
+        'orange': [(10, 25)],
+        'yellow': [(25, 35)],
+        'green': [(35, 85)],
+        'cyan': [(85, 95)],
+        'blue': [(95, 125)],
+        'purple': [(125, 145)],
+        'pink': [(145, 170)],
+    }
+
+    # Saturation and Value thresholds
+    low_saturation_threshold = 30  # Below this = grayscale/neutral
+    low_value_threshold = 40       # Below this = dark colors
+    high_value_threshold = 200     # Above this = light colors
+
+    def __init__(self, max_colors: int = MAX_COLORS_PER_ITEM,
+                 similarity_threshold: int = COLOR_SIMILARITY_THRESHOLD):
         """Initialize color detector with comprehensive color mappings"""
-        self.temp_files = []
+        self.max_colors = max_colors
+        self.similarity_threshold = similarity_threshold
         
-        # Define color ranges in HSV for better detection
-        self.color_ranges = {
-            # Hue ranges (0-180 in OpenCV)
-            'red': [(0, 10), (170, 180)],  # Red wraps around
-            'orange': [(10, 25)],
-            'yellow': [(25, 35)],
-            'green': [(35, 85)],
-            'cyan': [(85, 95)],
-            'blue': [(95, 125)],
-            'purple': [(125, 145)],
-            'pink': [(145, 170)],
-        }
-        
-        # Saturation and Value thresholds
-        self.low_saturation_threshold = 30  # Below this = grayscale/neutral
-        self.low_value_threshold = 40       # Below this = dark colors
-        self.high_value_threshold = 200     # Above this = light colors
+        # 32x32x32 lookup table mapping 5-bit-quantized RGB to a class id:
+        # classification becomes one indexed fetch for every call site.
+        # Built once here from bin midpoints via the batch classifier
+        # (~32k pixels, single cvtColor); costs 32 KB of memory.
+        rs, gs, bs = np.mgrid[4:256:8, 4:256:8, 4:256:8]
+        bins = np.stack([rs, gs, bs], axis=-1).reshape(-1, 1, 3).astype(np.uint8)
+        bins_hsv = cv2.cvtColor(bins, cv2.COLOR_RGB2HSV).reshape(-1, 3)
+        bin_names = classify_hsv_batch(bins_hsv)
+        self._lut_names = tuple(dict.fromkeys(bin_names))
+        name_ids = {name: i for i, name in enumerate(self._lut_names)}
+        self._class_lut = np.array(
+            [name_ids[name] for name in bin_names], dtype=np.uint8
+        ).reshape(32, 32, 32)
     
     def get_colors_from_bbox(self, image: np.ndarray, bbox: List[int], n_colors: int = 2) -> List[Dict]:
         """Extract colors with improved classification"""
         try:
-            print(f"  🎨 Extracting colors from bbox: {bbox}")
+            logger.debug("Extracting colors from bbox: %s", bbox)
             
             x1, y1, x2, y2 = bbox
             
@@ -49,43 +109,84 @@ class ColorDetector:
             
             # Ensure valid bbox
             if x2 <= x1 or y2 <= y1:
-                print(f"    ❌ Invalid bbox dimensions")
+                logger.debug("Invalid bbox dimensions: %s", bbox)
                 return []
             
             # Crop the region
             cropped = image[y1:y2, x1:x2]
             
             if cropped.size == 0:
-                print(f"    ❌ Empty cropped region")
+                logger.debug("Empty cropped region")
                 return []
             
-            print(f"    📐 Analyzing region: {x2-x1}x{y2-y1} pixels")
+            # Decimate large crops to ~20k pixels before any analysis:
+            # garment colors are spatially coherent, so strided sampling
+            # leaves the palette unchanged while clustering and HSV
+            # conversion costs drop linearly (same idea as ColorThief's
+            # quality parameter)
+            px = cropped.shape[0] * cropped.shape[1]
+            if px > 20000:
+                step = int(np.ceil(np.sqrt(px / 20000)))
+                cropped = np.ascontiguousarray(cropped[::step, ::step])
+            
+            logger.debug("Analyzing region: %dx%d pixels", x2 - x1, y2 - y1)
+            
+            # HSV histogram analysis first: it is both the most reliable
+            # method (it always wins the combine step's priority sort) and
+            # the cheapest, so when it is confident the other extractors
+            # are pure overhead
+            colors_hsv = self._extract_with_hsv_analysis(cropped, n_colors)
+            
+            if (len(colors_hsv) >= n_colors
+                    and colors_hsv[0].get('percentage', 0) >= 40):
+                logger.debug("Histogram confident; skipping fallback extractors")
+                return colors_hsv[:n_colors]
             
-            # Method 1: Simple color extraction (fallback)
+            # Fallback 1: Simple color extraction
             colors_simple = self._extract_simple_colors(cropped, n_colors)
             
-            # Method 2: Try ColorThief if available
+            # Fallback 2: Try ColorThief if available
             colors_colorthief = []
             try:
                 colors_colorthief = self._extract_with_colorthief(cropped)
             except Exception as e:
-                print(f"    ⚠️ ColorThief failed: {e}")
-            
-            # Method 3: HSV analysis (most reliable)
-            colors_hsv = self._extract_with_hsv_analysis(cropped, n_colors)
+                logger.debug("ColorThief failed: %s", e)
             
             # Combine results
             combined_colors = self._combine_color_results(
                 colors_simple, colors_colorthief, colors_hsv, n_colors
             )
             
-            print(f"    ✅ Found {len(combined_colors)} colors: {[c['name'] for c in combined_colors]}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "Found %d colors: %s",
+                    len(combined_colors),
+                    [c['name'] for c in combined_colors]
+                )
             return combined_colors[:n_colors]
             
         except Exception as e:
-            print(f"    ❌ Color extraction error: {e}")
+            logger.exception("Color extraction error")
             return self._get_fallback_colors()
     
+    def get_colors_from_bboxes(self, image: np.ndarray, bboxes: List[List[int]],
+                               n_colors: int = 2) -> List[List[Dict]]:
+        """Extract colors for several bboxes of the same image in one call
+
+        Batched entry point for multi-item outfits: callers hand over all
+        detections at once instead of driving one call per item, so the
+        frame crosses into the color pipeline a single time and identical
+        boxes (duplicate detections) are analyzed only once.
+        """
+        results: List[List[Dict]] = []
+        memo: Dict[Tuple[int, int, int, int], List[Dict]] = {}
+        for bbox in bboxes:
+            key = tuple(int(v) for v in bbox)
+            if key not in memo:
+                memo[key] = self.get_colors_from_bbox(image, bbox, n_colors)
+            results.append(memo[key])
+        return results
+
     def _extract_simple_colors(self, cropped_region: np.ndarray, n_colors: int) -> List[Dict]:
         """Simple color extraction using basic statistics"""
         try:
@@ -94,7 +195,7 @@ class ColorDetector:
             
             # Remove extreme values (very dark/bright)
             mask = np.all(pixels > 20, axis=1) & np.all(pixels < 240, axis=1)
-            if np.sum(mask) < 10:  # Fallback if too few pixels
+            if np.count_nonzero(mask) < 10:  # Fallback if too few pixels
                 mask = np.ones(len(pixels), dtype=bool)
             
             valid_pixels = pixels[mask]
@@ -114,13 +215,16 @@ class ColorDetector:
                 'method': 'average'
             })
             
-            # Method: Most saturated color
-            hsv_pixels = np.array([cv2.cvtColor(np.uint8([[pixel]]), cv2.COLOR_RGB2HSV)[0][0] 
-                                  for pixel in valid_pixels[:100:5]])  # Sample for speed
+            # Method: Most saturated color — one batched cvtColor over a
+            # subsample instead of a per-pixel Python loop
+            sub = valid_pixels[::max(1, len(valid_pixels) // 200)]
+            hsv_pixels = cv2.cvtColor(
+                sub.reshape(-1, 1, 3).astype(np.uint8), cv2.COLOR_RGB2HSV
+            ).reshape(-1, 3)
             
             if len(hsv_pixels) > 0:
-                most_saturated_idx = np.argmax(hsv_pixels[:, 1])  # Highest saturation
-                most_saturated_rgb = valid_pixels[most_saturated_idx * 5]
+                most_saturated_idx = int(np.argmax(hsv_pixels[:, 1]))  # Highest saturation
+                most_saturated_rgb = sub[most_saturated_idx]
                 color_name = self._classify_color_simple(tuple(most_saturated_rgb))
                 
                 if color_name != colors[0]['name']:  # Avoid duplicates
@@ -133,17 +237,21 @@ class ColorDetector:
             return colors
             
         except Exception as e:
-            print(f"    ⚠️ Simple extraction failed: {e}")
+            logger.debug("Simple extraction failed: %s", e)
             return []
     
     def _extract_with_colorthief(self, cropped_region: np.ndarray) -> List[Dict]:
         """Extract colors using ColorThief (if available)"""
-        temp_path = None
         try:
-            # Save temporary file
-            temp_path = self._save_temp_image(cropped_region)
+            # Feed ColorThief an in-memory PNG instead of round-tripping
+            # through a temp file on disk (BGR convert + JPEG write + unlink)
+            ok, encoded = cv2.imencode(
+                '.png', cv2.cvtColor(cropped_region, cv2.COLOR_RGB2BGR)
+            )
+            if not ok:
+                raise ValueError("Failed to encode image region")
             
-            color_thief = ColorThief(temp_path)
+            color_thief = ColorThief(BytesIO(encoded.tobytes()))
             palette = color_thief.get_palette(color_count=3, quality=10)
             
             colors = []
@@ -158,70 +266,80 @@ class ColorDetector:
             return colors
             
         except Exception as e:
-            print(f"    ⚠️ ColorThief error: {e}")
+            logger.debug("ColorThief error: %s", e)
             return []
-        finally:
-            if temp_path:
-                self._cleanup_temp_file(temp_path)
     
     def _extract_with_hsv_analysis(self, cropped_region: np.ndarray, n_colors: int) -> List[Dict]:
         """Extract colors using HSV analysis"""
         try:
-            # Convert to HSV
-            hsv_image = cv2.cvtColor(cropped_region, cv2.COLOR_RGB2HSV)
-            
-            # Create mask for valid pixels
-            mask = self._create_valid_pixel_mask(hsv_image)
-            
-            if np.sum(mask) < 50:  # Not enough valid pixels
-                print(f"    ⚠️ Too few valid pixels for HSV analysis")
+            # Mask straight from RGB (S and V fall out of channel max/min),
+            # then convert only the surviving pixels to HSV — the full-crop
+            # cvtColor wrote an H plane the mask never read
+            mask = self._create_valid_pixel_mask(cropped_region)
+            
+            # count_nonzero short-circuits on the bool mask; summing it
+            # materialized an int64 reduction just to compare against 50
+            if np.count_nonzero(mask) < 50:  # Not enough valid pixels
+                logger.debug("Too few valid pixels for HSV analysis")
                 return []
             
             # Get valid pixels
             valid_pixels_rgb = cropped_region[mask]
-            valid_pixels_hsv = hsv_image[mask]
+            valid_pixels_hsv = cv2.cvtColor(
+                valid_pixels_rgb.reshape(-1, 1, 3), cv2.COLOR_RGB2HSV
+            ).reshape(-1, 3)
+            
+            # Dominant colors from a 1-D histogram over quantized HSV
+            # bins: one streaming O(N) bincount pass instead of k-means's
+            # repeated full-data distance computations. Bin layout packs
+            # H>>3 (5 bits), S>>4 (4 bits), V>>4 (4 bits) into 13 bits.
+            key = (
+                (valid_pixels_hsv[:, 0].astype(np.uint32) >> 3)
+                | ((valid_pixels_hsv[:, 1].astype(np.uint32) >> 4) << 5)
+                | ((valid_pixels_hsv[:, 2].astype(np.uint32) >> 4) << 9)
+            )
+            counts = np.bincount(key, minlength=1 << 13)
+            
+            n_top = min(n_colors, int(np.count_nonzero(counts)))
+            top_bins = np.argpartition(counts, -n_top)[-n_top:]
+            top_bins = top_bins[np.argsort(counts[top_bins])[::-1]]
+            
+            # Decode bin centers back to HSV once, classify in one batch
+            centers_hsv = np.stack([
+                ((top_bins & 31) << 3) + 4,
+                (((top_bins >> 5) & 15) << 4) + 8,
+                ((top_bins >> 9) << 4) + 8
+            ], axis=1).astype(np.uint8)
+            centers_rgb = cv2.cvtColor(
+                centers_hsv.reshape(-1, 1, 3), cv2.COLOR_HSV2RGB
+            ).reshape(-1, 3)
+            center_names = classify_hsv_batch(centers_hsv)
             
-            # Try K-means clustering if sklearn is available
-            try:
-                from sklearn.cluster import KMeans
-                
-                n_clusters = min(n_colors, max(1, len(valid_pixels_rgb) // 100))
-                
-                kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
-                kmeans.fit(valid_pixels_rgb)
-                
-                colors = []
-                labels = kmeans.labels_
+            colors = []
+            total = len(key)
+            for bin_idx, rgb_c, name in zip(top_bins, centers_rgb, center_names):
+                bin_percentage = (counts[bin_idx] / total) * 100
                 
-                for i, center_rgb in enumerate(kmeans.cluster_centers_):
-                    # Count pixels in this cluster
-                    cluster_size = np.sum(labels == i)
-                    cluster_percentage = (cluster_size / len(labels)) * 100
-                    
-                    # Skip very small clusters
-                    if cluster_percentage < 15:
-                        continue
-                    
-                    color_name = self._classify_color_simple(tuple(center_rgb.astype(int)))
-                    
-                    colors.append({
-                        'rgb': center_rgb.astype(int).tolist(),
-                        'name': color_name,
-                        'method': 'kmeans',
-                        'percentage': cluster_percentage
-                    })
+                # Skip bins that don't dominate the region
+                if bin_percentage < 15:
+                    continue
                 
-                # Sort by cluster size
-                colors.sort(key=lambda x: x.get('percentage', 0), reverse=True)
+                colors.append({
+                    'rgb': rgb_c.astype(int).tolist(),
+                    'name': name,
+                    'method': 'histogram',
+                    'percentage': bin_percentage
+                })
+            
+            if colors:
                 return colors
-                
-            except ImportError:
-                print(f"    ⚠️ sklearn not available, using simple HSV analysis")
-                # Fallback: just get dominant colors by averaging
-                return self._simple_hsv_analysis(valid_pixels_rgb, valid_pixels_hsv)
+            
+            # Textured regions spread counts across many bins; fall back
+            # to the average/saturated summary rather than returning nothing
+            return self._simple_hsv_analysis(valid_pixels_rgb, valid_pixels_hsv)
                 
         except Exception as e:
-            print(f"    ⚠️ HSV analysis error: {e}")
+            logger.debug("HSV analysis error: %s", e)
             return []
     
     def _simple_hsv_analysis(self, valid_pixels_rgb: np.ndarray, valid_pixels_hsv: np.ndarray) -> List[Dict]:
@@ -252,71 +370,34 @@ class ColorDetector:
         
         return colors
     
-    def _create_valid_pixel_mask(self, hsv_image: np.ndarray) -> np.ndarray:
-        """Create mask for valid pixels (not shadows/highlights)"""
-        h, s, v = cv2.split(hsv_image)
-        
-        # Remove very dark pixels (shadows)
-        mask_dark = v > 25
-        
-        # Remove very bright pixels (highlights/overexposure)
-        mask_bright = v < 245
-        
-        # Remove very desaturated pixels in bright areas
-        mask_desat = (s > 10) | (v < 200)
+    def _create_valid_pixel_mask(self, rgb_region: np.ndarray) -> np.ndarray:
+        """Create mask for valid pixels (not shadows/highlights)
+
+        Works directly on RGB: OpenCV's V is the channel max and its
+        S is 255*(max-min)/max, so the S>10 test becomes integer
+        arithmetic on the channel spread and no HSV buffer is written
+        for the masking pass at all.
+        """
+        mx = rgb_region.max(axis=2).astype(np.int32)
+        mn = rgb_region.min(axis=2).astype(np.int32)
         
-        return mask_dark & mask_bright & mask_desat
+        # dark (shadows) out, bright (highlights) out, and desaturated
+        # pixels in bright areas out; S > 10  <=>  255*(mx-mn) > 10*mx
+        return (mx > 25) & (mx < 245) & (((mx - mn) * 255 > 10 * mx) | (mx < 200))
     
     def _classify_color_simple(self, rgb: Tuple[int, int, int]) -> str:
         """Simplified color classification"""
-        r, g, b = rgb
+        r, g, b = (int(c) for c in rgb)
         
         # Handle edge cases
-        if any(c < 0 or c > 255 for c in rgb):
+        if any(c < 0 or c > 255 for c in (r, g, b)):
             return 'unknown'
         
         try:
-            # Convert to HSV for better classification
-            hsv = cv2.cvtColor(np.uint8([[[r, g, b]]]), cv2.COLOR_RGB2HSV)[0][0]
-            h, s, v = hsv
-            
-            # Grayscale (low saturation)
-            if s < 30:
-                if v < 50:
-                    return 'black'
-                elif v < 100:
-                    return 'gray'
-                elif v < 200:
-                    return 'light_gray'
-                else:
-                    return 'white'
-            
-            # Dark colors
-            if v < 60:
-                return 'black'
-            
-            # Classify by hue
-            if (h >= 0 and h <= 10) or (h >= 170 and h <= 180):
-                return 'red'
-            elif h > 10 and h <= 25:
-                return 'orange'
-            elif h > 25 and h <= 35:
-                return 'yellow'
-            elif h > 35 and h <= 85:
-                return 'green'
-            elif h > 85 and h <= 95:
-                return 'cyan'
-            elif h > 95 and h <= 125:
-                return 'blue'
-            elif h > 125 and h <= 145:
-                return 'purple'
-            elif h > 145 and h < 170:
-                return 'pink'
-            
-            return 'unknown'
+            return self._lut_names[self._class_lut[r >> 3, g >> 3, b >> 3]]
             
         except Exception as e:
-            print(f"    ⚠️ Color classification error: {e}")
+            logger.debug("Color classification error: %s", e)
             return 'unknown'
     
     def _combine_color_results(self, colors1: List[Dict], colors2: List[Dict], 
@@ -334,9 +415,9 @@ class ColorDetector:
                 seen_colors.add(color_name)
                 unique_colors.append(color)
         
-        # Sort by preference: kmeans > hsv > colorthief > simple
+        # Sort by preference: histogram > hsv > colorthief > simple
         method_priority = {
-            'kmeans': 1,
+            'histogram': 1,
             'hsv_average': 2,
             'hsv_saturated': 3,
             'colorthief': 4,
@@ -358,48 +439,14 @@ class ColorDetector:
             {'rgb': [64, 64, 64], 'name': 'dark_gray', 'method': 'fallback'}
         ]
     
-    def _save_temp_image(self, image_region: np.ndarray) -> str:
-        """Save image region to temporary file"""
-        try:
-            temp_fd, temp_path = tempfile.mkstemp(suffix='.jpg')
-            os.close(temp_fd)
-            
-            # Ensure image is valid
-            if image_region.size == 0:
-                raise ValueError("Empty image region")
-            
-            # Convert RGB to BGR for OpenCV
-            image_bgr = cv2.cvtColor(image_region, cv2.COLOR_RGB2BGR)
-            success = cv2.imwrite(temp_path, image_bgr)
-            
-            if not success:
-                raise ValueError("Failed to write image")
-            
-            self.temp_files.append(temp_path)
-            return temp_path
-            
-        except Exception as e:
-            print(f"    ⚠️ Failed to save temp image: {e}")
-            raise
-    
-    def _cleanup_temp_file(self, temp_path: str) -> None:
-        """Clean up a specific temporary file"""
-        try:
-            if temp_path and os.path.exists(temp_path):
-                os.unlink(temp_path)
-            if temp_path in self.temp_files:
-                self.temp_files.remove(temp_path)
-        except Exception as e:
-            print(f"⚠️ Could not clean up temp file {temp_path}: {e}")
-    
-    def cleanup_all_temp_files(self) -> None:
-        """Clean up all temporary files"""
-        for temp_path in self.temp_files.copy():
-            self._cleanup_temp_file(temp_path)
-    
-    def __del__(self):
-        """Ensure cleanup on object destruction"""
-        try:
-            self.cleanup_all_temp_files()
-        except:
-            pass  # Ignore errors during cleanup
\ No newline at end of file
+@lru_cache(maxsize=1)
+def get_color_detector() -> ColorDetector:
+    """Return the shared ColorDetector built from the config constants.
+
+    Built once per process; keyed implicitly on the import-time config
+    values so every analysis reuses the same detector instance.
+    """
+    return ColorDetector(
+        max_colors=MAX_COLORS_PER_ITEM,
+        similarity_threshold=COLOR_SIMILARITY_THRESHOLD
+    )
@@ -2,18 +2,84 @@
 LLM suggestion generator using Google Gemini for outfit improvement advice
 """
 
+from collections import OrderedDict
+from threading import Lock
 from typing import Dict, List, Optional
+import hashlib
+import logging
+import re
 import time
 
+from app.config import LLM_SKIP_SCORE_THRESHOLD
 from app.services.model_loader import model_loader
 
+# Child of the app logger configured in main.py (queue-backed handlers)
+logger = logging.getLogger("outfit_evaluator.llm")
+
+# Identical prompts get identical advice; keep enough entries to cover a
+# day of distinct prompts without holding every response forever
+_RESPONSE_CACHE_MAX = 512
+
+# Section headers the prompt asks Gemini to emit, compiled once: one
+# C-level regex scan splits the response instead of testing every line
+# against every header name in Python
+_HEADER_RE = re.compile(
+    r"\*\*\s*(WHAT'S WORKING|AREAS FOR IMPROVEMENT|SPECIFIC SUGGESTIONS|"
+    r"OCCASION-SPECIFIC TIPS|SHOPPING SUGGESTIONS)\s*:?\s*\*\*",
+    re.IGNORECASE
+)
+_BULLET_RE = re.compile(r"^[-*•]\s+(.*)$")
+_SECTION_KEYS = {
+    "WHAT'S WORKING": 'whats_working',
+    'AREAS FOR IMPROVEMENT': 'areas_for_improvement',
+    'SPECIFIC SUGGESTIONS': 'specific_suggestions',
+    'OCCASION-SPECIFIC TIPS': 'occasion_tips',
+    'SHOPPING SUGGESTIONS': 'shopping_suggestions',
+}
+
+# Quick-tip reference tables: static lookups replace the if/elif cascade
+# that rebuilt these lists on every call
+_PROFESSIONAL_TIPS = (
+    "Ensure all pieces are wrinkle-free and well-fitted",
+    "Stick to conservative color palette",
+    "Keep accessories minimal and professional",
+)
+_QUICK_TIPS_BY_OCCASION = {
+    'job_interview': _PROFESSIONAL_TIPS,
+    'work_meeting': _PROFESSIONAL_TIPS,
+    'date_night': (
+        "Add one statement piece to create visual interest",
+        "Consider the venue when choosing formality level",
+        "Don't forget grooming details - they matter",
+    ),
+    'beach_vacation': (
+        "Choose breathable fabrics for comfort",
+        "Don't forget sun protection accessories",
+        "Opt for easy-to-clean materials",
+    ),
+}
+_ITEM_TIPS = {
+    'jacket': "Ensure jacket fits properly at shoulders and sleeves",
+    'shoe': "Make sure shoes are clean and appropriate for walking",
+    'bag': "Choose bag size appropriate for the occasion needs",
+}
+
 class LLMSuggestionGenerator:
     """Generates fashion suggestions using LLM"""
     
     def __init__(self):
         """Initialize LLM suggestion generator"""
         self.model_available = False
-        print("LLMSuggestionGenerator initialized")
+
+        # Exact-prompt memo of raw Gemini response text. The semantic
+        # cache upstream collapses near-duplicates before they reach this
+        # class; this layer protects direct callers and costs one dict
+        # probe per call. Text is re-parsed per hit so suggestions merge
+        # with the caller's own analysis dict.
+        self._response_cache: OrderedDict = OrderedDict()
+        self._response_cache_lock = Lock()
+
+        logger.info("LLMSuggestionGenerator initialized")
     
     def _ensure_model_loaded(self) -> bool:
         """Ensure Gemini model is available"""
@@ -34,41 +100,77 @@ class LLMSuggestionGenerator:
         Returns:
             Enhanced analysis result with LLM suggestions
         """
-        print("Generating LLM suggestions...")
+        logger.debug("Generating LLM suggestions...")
         start_time = time.time()
         
+        # Already-excellent outfits get the same advice bucket either
+        # way; skip the API latency and cost for them
+        if analysis_result.get('style_score', 0) >= LLM_SKIP_SCORE_THRESHOLD:
+            logger.debug("Score above LLM threshold, using template suggestions")
+            enhanced_result = self._create_fallback_suggestions(analysis_result)
+            # Deterministic policy skip, not an error fallback: callers
+            # may cache this, unlike the degraded outage paths below
+            enhanced_result['llm_skipped'] = True
+            return enhanced_result
+        
         if not self._ensure_model_loaded():
-            print("Gemini model not available, using fallback suggestions")
+            logger.warning("Gemini model not available, using fallback suggestions")
             return self._create_fallback_suggestions(analysis_result)
         
         try:
             # Create prompt for LLM
             prompt = self._create_prompt(analysis_result, user_preferences)
             
-            # Get Gemini model
-            _, _, _, gemini_model = model_loader.get_models()
+            # Identical prompt seen before: skip the API round-trip
+            response_text = self._get_cached_response(prompt)
             
-            # Generate response
-            response = gemini_model.generate_content(prompt)
+            if response_text is None:
+                # Get Gemini model
+                _, _, _, gemini_model = model_loader.get_models()
+                
+                # Generate response
+                response = gemini_model.generate_content(prompt)
+                response_text = response.text
+                
+                if response_text:
+                    self._store_cached_response(prompt, response_text)
             
-            if response.text:
+            if response_text:
                 # Parse and structure the response
-                enhanced_result = self._parse_response(response.text, analysis_result)
+                enhanced_result = self._parse_response(response_text, analysis_result)
                 
                 generation_time = time.time() - start_time
                 enhanced_result['suggestion_generation_time'] = round(generation_time, 2)
                 enhanced_result['ai_suggestions_available'] = True
                 
-                print(f"LLM suggestions generated in {generation_time:.2f}s")
+                logger.info("LLM suggestions generated in %.2fs", generation_time)
                 return enhanced_result
             else:
-                print("Empty response from Gemini, using fallback")
+                logger.warning("Empty response from Gemini, using fallback")
                 return self._create_fallback_suggestions(analysis_result)
                 
         except Exception as e:
-            print(f"Error generating LLM suggestions: {e}")
+            logger.exception("Error generating LLM suggestions")
             return self._create_fallback_suggestions(analysis_result)
     
+    def _get_cached_response(self, prompt: str) -> Optional[str]:
+        """Return the memoized response text for an identical prompt"""
+        key = hashlib.sha256(prompt.encode()).hexdigest()
+        with self._response_cache_lock:
+            text = self._response_cache.get(key)
+            if text is not None:
+                self._response_cache.move_to_end(key)
+            return text
+    
+    def _store_cached_response(self, prompt: str, response_text: str) -> None:
+        """Memoize a response, evicting the oldest entry when full"""
+        key = hashlib.sha256(prompt.encode()).hexdigest()
+        with self._response_cache_lock:
+            self._response_cache[key] = response_text
+            self._response_cache.move_to_end(key)
+            while len(self._response_cache) > _RESPONSE_CACHE_MAX:
+                self._response_cache.popitem(last=False)
+    
     def _create_prompt(self, analysis_result: Dict, user_preferences: Optional[Dict]) -> str:
         """Create detailed prompt for Gemini"""
         
@@ -168,44 +270,28 @@ Keep all suggestions practical, specific, and achievable. Focus on improvements
             'raw_llm_response': response_text
         }
         
-        # Parse sections from response
-        lines = response_text.split('\n')
-        current_section = None
+        # One regex split yields alternating (header, body) chunks; the
+        # per-line header cascade ran every header test on every line
+        parts = _HEADER_RE.split(response_text)
         
-        for line in lines:
-            line = line.strip()
-            
-            # Identify section headers
-            if '**WHAT\'S WORKING:**' in line.upper():
-                current_section = 'whats_working'
-                continue
-            elif '**AREAS FOR IMPROVEMENT:**' in line.upper():
-                current_section = 'areas_for_improvement'
-                continue
-            elif '**SPECIFIC SUGGESTIONS:**' in line.upper():
-                current_section = 'specific_suggestions'
-                continue
-            elif '**OCCASION-SPECIFIC TIPS:**' in line.upper():
-                current_section = 'occasion_tips'
-                continue
-            elif '**SHOPPING SUGGESTIONS:**' in line.upper():
-                current_section = 'shopping_suggestions'
-                continue
+        for header, body in zip(parts[1::2], parts[2::2]):
+            section = _SECTION_KEYS[header.upper()]
+            lines = [
+                stripped for line in body.splitlines()
+                if (stripped := line.strip()) and not stripped.startswith('**')
+            ]
             
-            # Process content based on current section
-            if line and current_section and not line.startswith('**'):
-                if current_section == 'specific_suggestions':
-                    # Handle list items
-                    if line.startswith('- ') or line.startswith('• ') or line.startswith('* '):
-                        suggestions[current_section].append(line[2:].strip())
-                    elif line and not line.startswith('['):
-                        suggestions[current_section].append(line)
-                else:
-                    # Handle text sections
-                    if suggestions[current_section]:
-                        suggestions[current_section] += ' ' + line
-                    else:
-                        suggestions[current_section] = line
+            if section == 'specific_suggestions':
+                # Handle list items
+                for line in lines:
+                    bullet = _BULLET_RE.match(line)
+                    if bullet:
+                        suggestions[section].append(bullet.group(1).strip())
+                    elif not line.startswith('['):
+                        suggestions[section].append(line)
+            else:
+                # Handle text sections
+                suggestions[section] = ' '.join(lines)
         
         # Clean up text sections
         for key in ['whats_working', 'areas_for_improvement', 'occasion_tips', 'shopping_suggestions']:
@@ -277,35 +363,9 @@ Keep all suggestions practical, specific, and achievable. Focus on improvements
     def get_quick_tips(self, occasion: str, detected_items: List[str]) -> List[str]:
         """Get quick styling tips based on occasion and items"""
         
-        tips = []
-        
-        if occasion in ['job_interview', 'work_meeting']:
-            tips.extend([
-                "Ensure all pieces are wrinkle-free and well-fitted",
-                "Stick to conservative color palette",
-                "Keep accessories minimal and professional"
-            ])
-            
-        elif occasion == 'date_night':
-            tips.extend([
-                "Add one statement piece to create visual interest",
-                "Consider the venue when choosing formality level",
-                "Don't forget grooming details - they matter"
-            ])
-            
-        elif occasion == 'beach_vacation':
-            tips.extend([
-                "Choose breathable fabrics for comfort",
-                "Don't forget sun protection accessories",
-                "Opt for easy-to-clean materials"
-            ])
+        tips = list(_QUICK_TIPS_BY_OCCASION.get(occasion, ()))
         
-        # Item-specific tips
-        if 'jacket' in detected_items:
-            tips.append("Ensure jacket fits properly at shoulders and sleeves")
-        if 'shoe' in detected_items:
-            tips.append("Make sure shoes are clean and appropriate for walking")
-        if 'bag' in detected_items:
-            tips.append("Choose bag size appropriate for the occasion needs")
+        # Item-specific tips, in the order items were detected
+        tips += [_ITEM_TIPS[item] for item in detected_items if item in _ITEM_TIPS]
         
         return tips[:5]  # Return max 5 tips
\ No newline at end of file
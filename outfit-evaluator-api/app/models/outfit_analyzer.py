@@ -3,41 +3,84 @@ Main outfit analysis module that combines detection, color analysis, and scoring
 """
 
 import cv2
+import hashlib
+import logging
+import os
 import numpy as np
+from collections import OrderedDict
+from threading import Lock
 import torch
 import clip
 from PIL import Image
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import time
 
-from app.config import CLASS_NAMES, OCCASIONS, SCORING_WEIGHTS
-from app.models.color_detector import ColorDetector
+from app.config import (
+    BASE_DIR, CLIP_MODEL_NAME, CLASS_NAMES, OCCASIONS,
+    SCORING_WEIGHTS, SCORING_WEIGHTS_VEC
+)
+from app.models.color_detector import get_color_detector
 from app.services.model_loader import model_loader
 
+# Child of the app logger configured in main.py (queue-backed handlers);
+# per-step tracing stays at DEBUG, one summary line per analysis at INFO
+logger = logging.getLogger("outfit_evaluator.analyzer")
+
 class OutfitAnalyzer:
     """Main class for analyzing outfit images and providing style scores"""
     
+    # Color-temperature reference sets for clash detection
+    _WARM_COLORS = frozenset({'red', 'orange', 'yellow', 'pink'})
+    _COOL_COLORS = frozenset({'blue', 'green', 'purple', 'teal', 'navy'})
+    
+    # Formality reference sets for completeness/coherence scoring
+    _FORMAL_ITEMS = frozenset({'jacket', 'shirt'})
+    _CASUAL_ITEMS = frozenset({'shorts', 'sunglass'})
+    
     def __init__(self):
         """Initialize outfit analyzer"""
-        self.color_detector = ColorDetector()
+        self.color_detector = get_color_detector()
         self.class_names = CLASS_NAMES
         self.occasions = OCCASIONS
         self.scoring_weights = SCORING_WEIGHTS
         
-        # Models will be loaded from model_loader service
+        # Models will be loaded from model_loader service; handles are
+        # pinned here on first use so the hot path reads attributes
+        # instead of re-fetching and unpacking the loader tuple per step
         self._models_ready = False
-        
-        print("OutfitAnalyzer initialized")
+        self._yolo_model = None
+        self._clip_model = None
+        self._clip_preprocess = None
+
+        # Cache of normalized CLIP text features per occasion; the prompts
+        # are fixed so the text encoder only runs once per occasion.
+        # Warm-started from a content-hashed disk cache so restarted
+        # workers skip the text-encoder forwards entirely.
+        self._text_feature_cache_path = self._build_text_feature_cache_path()
+        self._occasion_text_features = self._load_text_feature_cache()
+
+        # LRU of normalized CLIP image features keyed by pixel content:
+        # re-scoring the same photo against a different occasion skips
+        # the ViT forward (the dominant cost of CLIP scoring) and pays
+        # only a hash plus one matmul. ~128 x 512 floats resident.
+        self._image_feature_cache: OrderedDict = OrderedDict()
+        self._image_feature_cache_max = 128
+        self._image_feature_lock = Lock()
+        
+        logger.info("OutfitAnalyzer initialized")
     
     def _ensure_models_loaded(self) -> bool:
-        """Ensure all required models are loaded"""
+        """Ensure all required models are loaded and pin their handles"""
         if not self._models_ready:
             yolo_model, clip_model, clip_preprocess, _ = model_loader.get_models()
             
             if yolo_model is None or clip_model is None:
-                print("Error: Required models not loaded")
+                logger.error("Required models not loaded")
                 return False
             
+            self._yolo_model = yolo_model
+            self._clip_model = clip_model
+            self._clip_preprocess = clip_preprocess
             self._models_ready = True
         
         return True
@@ -62,20 +105,26 @@ class OutfitAnalyzer:
         if occasion not in self.occasions:
             raise ValueError(f"Invalid occasion. Must be one of: {list(self.occasions.keys())}")
         
-        print(f"Analyzing outfit for occasion: {occasion}")
+        logger.debug("Analyzing outfit for occasion: %s", occasion)
         
-        # Load and preprocess image
-        image = self._load_image(image_path)
+        # Load and preprocess image (single decode shared by every step)
+        image_bgr, image = self._load_image(image_path)
+        pil_image = Image.fromarray(image)
+        
+        # Content key for the CLIP feature cache: upload temp paths are
+        # unique per request, so identity has to come from the pixels
+        image_key = hashlib.sha1(image_bgr.tobytes()).hexdigest()
         
         # Step 1: Detect clothing items
-        detections = self._detect_clothing_items(image_path)
-        print(f"Detected {len(detections)} clothing items")
+        detections = self._detect_clothing_items(image_bgr)
+        logger.debug("Detected %d clothing items", len(detections))
         
         # Step 2: Extract colors for each item
         all_colors = self._extract_colors_from_detections(image, detections)
         
         # Step 3: Calculate different scoring components
-        scores = self._calculate_all_scores(image_path, occasion, detections, all_colors)
+        scores = self._calculate_all_scores(pil_image, occasion, detections, all_colors,
+                                            image_key=image_key)
         
         # Step 4: Calculate final weighted score
         final_score = self._calculate_final_score(scores)
@@ -103,28 +152,90 @@ class OutfitAnalyzer:
             'analysis_time_seconds': round(analysis_time, 2)
         }
         
-        print(f"Analysis complete in {analysis_time:.2f}s. Final score: {final_score:.1f}/10")
+        logger.info("Analysis complete in %.2fs. Final score: %.1f/10", analysis_time, final_score)
         
         return result
     
-    def _load_image(self, image_path: str) -> np.ndarray:
-        """Load and convert image to RGB format"""
-        image = cv2.imread(image_path)
-        if image is None:
+    def analyze_batch(self, requests: List) -> List:
+        """
+        Analyze a batch of (image_path, occasion) pairs
+
+        Used by the async batch queue to amortize fixed per-call overhead
+        across concurrent requests. Failures are returned per item as
+        Exception objects so one bad image doesn't fail the whole batch.
+
+        Args:
+            requests: List of (image_path, occasion) tuples
+
+        Returns:
+            List of result dicts or Exceptions, in input order
+        """
+        results = []
+        for image_path, occasion in requests:
+            try:
+                results.append(self.analyze_outfit(image_path, occasion))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def warmup(self) -> bool:
+        """
+        Run one throwaway inference through each model at startup
+
+        The first real request otherwise pays CUDA kernel compilation,
+        cuDNN autotuning, and lazy-allocation costs inside YOLO and CLIP.
+        A synthetic image through both models, plus text features for
+        every occasion, moves that cost into startup.
+
+        Returns:
+            bool: True if warmup completed
+        """
+        if not self._ensure_models_loaded():
+            return False
+
+        try:
+            dummy = np.zeros((640, 640, 3), dtype=np.uint8)
+            self._yolo_model(dummy, verbose=False)
+
+            with torch.inference_mode():
+                dummy_pil = Image.fromarray(dummy)
+                image_input = self._clip_preprocess(dummy_pil).unsqueeze(0).to(model_loader.device)
+                self._clip_model.encode_image(image_input)
+
+                # Also fills (and persists) the per-occasion text features
+                for occasion in self.occasions:
+                    self._get_occasion_text_features(occasion, self._clip_model)
+
+            logger.info("Model warmup complete")
+            return True
+
+        except Exception as e:
+            logger.warning("Warmup failed (first request will pay the cost): %s", e)
+            return False
+
+    def _load_image(self, image_path: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Load the image once, returning (BGR, RGB) copies of one decode
+
+        YOLO follows OpenCV's BGR convention for ndarray inputs while the
+        color pipeline and CLIP preprocessing want RGB. Decoding here and
+        converting in memory replaces the three separate disk reads the
+        pipeline used to do (cv2.imread, YOLO re-reading the path, and
+        PIL.Image.open for CLIP).
+        """
+        image_bgr = cv2.imread(image_path)
+        if image_bgr is None:
             raise ValueError(f"Could not load image from {image_path}")
         
         # Convert BGR to RGB
-        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        return image_rgb
+        image_rgb = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB)
+        return image_bgr, image_rgb
     
-    def _detect_clothing_items(self, image_path: str) -> List[Dict]:
+    def _detect_clothing_items(self, image_bgr: np.ndarray) -> List[Dict]:
         """Detect clothing items using YOLO model"""
-        yolo_model, _, _, _ = model_loader.get_models()
-        
-        if yolo_model is None:
+        if self._yolo_model is None:
             raise RuntimeError("YOLO model not available")
         
-        results = yolo_model(image_path)
+        results = self._yolo_model(image_bgr, verbose=False)
         
         detections = []
         for result in results:
@@ -148,96 +259,171 @@ class OutfitAnalyzer:
         """Extract colors from all detected clothing items"""
         all_colors = []
         
-        print("Extracting colors from detected items...")
+        logger.debug("Extracting colors from detected items...")
         
-        for i, detection in enumerate(detections):
-            print(f"  Processing item {i+1}: {detection['class']}")
-            
-            colors = self.color_detector.get_colors_from_bbox(
-                image, 
-                detection['bbox'], 
-                n_colors=2
-            )
-            
+        colors_per_item = self.color_detector.get_colors_from_bboxes(
+            image,
+            [detection['bbox'] for detection in detections],
+            n_colors=2
+        )
+
+        for i, (detection, colors) in enumerate(zip(detections, colors_per_item)):
             detection['colors'] = colors
             all_colors.extend(colors)
             
-            color_names = [c['name'] for c in colors]
-            print(f"    Colors found: {color_names}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "  Item %d (%s): colors %s",
+                    i + 1, detection['class'], [c['name'] for c in colors]
+                )
         
         return all_colors
     
-    def _calculate_all_scores(self, image_path: str, occasion: str, 
-                            detections: List[Dict], all_colors: List[Dict]) -> Dict:
+    def _calculate_all_scores(self, pil_image: Image.Image, occasion: str, 
+                            detections: List[Dict], all_colors: List[Dict],
+                            image_key: Optional[str] = None) -> Dict:
         """Calculate all scoring components"""
-        print("Calculating scores...")
+        logger.debug("Calculating scores...")
         
         scores = {}
         
         # CLIP contextual score
-        scores['clip_score'] = self._calculate_clip_score(image_path, occasion)
-        print(f"  CLIP score: {scores['clip_score']:.1f}/10")
+        scores['clip_score'] = self._calculate_clip_score(pil_image, occasion, image_key)
+        logger.debug("  CLIP score: %.1f/10", scores['clip_score'])
         
         # Color harmony score
         scores['color_harmony'] = self._calculate_color_harmony_score(all_colors)
-        print(f"  Color harmony: {scores['color_harmony']:.1f}/10")
+        logger.debug("  Color harmony: %.1f/10", scores['color_harmony'])
         
         # Item completeness score
         scores['completeness'] = self._calculate_completeness_score(detections, occasion)
-        print(f"  Completeness: {scores['completeness']:.1f}/10")
+        logger.debug("  Completeness: %.1f/10", scores['completeness'])
         
         # Style coherence score
         scores['coherence'] = self._calculate_coherence_score(detections, occasion)
-        print(f"  Coherence: {scores['coherence']:.1f}/10")
+        logger.debug("  Coherence: %.1f/10", scores['coherence'])
         
         return scores
     
-    def _calculate_clip_score(self, image_path: str, occasion: str) -> float:
+    def _build_text_feature_cache_path(self) -> str:
+        """Content-addressed cache file for the occasion text features.
+
+        The filename hashes the CLIP model name and the occasion texts, so
+        editing either invalidates the cache automatically.
+        """
+        content = CLIP_MODEL_NAME + "|" + "|".join(
+            f"{k}={v}" for k, v in sorted(OCCASIONS.items())
+        )
+        key = hashlib.sha256(content.encode()).hexdigest()[:16]
+        return str(BASE_DIR / ".cache" / f"occ_emb_{key}.pt")
+
+    def _load_text_feature_cache(self) -> Dict:
+        """Load persisted occasion text features, if present"""
+        try:
+            if os.path.exists(self._text_feature_cache_path):
+                features = torch.load(
+                    self._text_feature_cache_path,
+                    map_location=model_loader.device
+                )
+                logger.info("Loaded %d cached occasion text features", len(features))
+                return features
+        except Exception as e:
+            logger.warning("Could not load text feature cache: %s", e)
+        return {}
+
+    def _persist_text_feature_cache(self) -> None:
+        """Atomically persist the occasion text features to disk"""
+        try:
+            cache_dir = os.path.dirname(self._text_feature_cache_path)
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_path = self._text_feature_cache_path + ".tmp"
+            torch.save(self._occasion_text_features, tmp_path)
+            os.replace(tmp_path, self._text_feature_cache_path)
+        except Exception as e:
+            logger.warning("Could not persist text feature cache: %s", e)
+
+    def _get_occasion_text_features(self, occasion: str, clip_model) -> torch.Tensor:
+        """Get normalized CLIP text features for an occasion's fixed prompts.
+
+        Encoded once per occasion and cached; subsequent requests only pay
+        for the image encode plus one matmul against this matrix.
+        """
+        cached = self._occasion_text_features.get(occasion)
+        if cached is not None:
+            return cached
+
+        occasion_context = self.occasions[occasion]
+
+        # Create context-specific prompts
+        prompts = [
+            f"professional outfit suitable for {occasion_context}",
+            f"appropriate and stylish attire for {occasion_context}",
+            f"well-dressed and coordinated for {occasion_context}",
+            f"fashionable look perfect for {occasion_context}"
+        ]
+
+        with torch.inference_mode():
+            text_tokens = clip.tokenize(prompts).to(model_loader.device)
+            text_features = clip_model.encode_text(text_tokens)
+            text_features = text_features / text_features.norm(dim=-1, keepdim=True)
+
+        self._occasion_text_features[occasion] = text_features
+        self._persist_text_feature_cache()
+        return text_features
+
+    def _get_image_features(self, pil_image: Image.Image, clip_model,
+                            clip_preprocess, image_key: Optional[str]) -> torch.Tensor:
+        """Get normalized CLIP image features, cached by pixel content"""
+        if image_key is not None:
+            with self._image_feature_lock:
+                cached = self._image_feature_cache.get(image_key)
+                if cached is not None:
+                    self._image_feature_cache.move_to_end(image_key)
+                    return cached
+
+        image_input = clip_preprocess(pil_image).unsqueeze(0).to(model_loader.device)
+
+        with torch.inference_mode():
+            image_features = clip_model.encode_image(image_input)
+            image_features = image_features / image_features.norm(dim=-1, keepdim=True)
+
+        if image_key is not None:
+            with self._image_feature_lock:
+                self._image_feature_cache[image_key] = image_features
+                self._image_feature_cache.move_to_end(image_key)
+                while len(self._image_feature_cache) > self._image_feature_cache_max:
+                    self._image_feature_cache.popitem(last=False)
+
+        return image_features
+
+    def _calculate_clip_score(self, pil_image: Image.Image, occasion: str,
+                              image_key: Optional[str] = None) -> float:
         """Calculate CLIP-based contextual appropriateness score"""
-        _, clip_model, clip_preprocess, _ = model_loader.get_models()
-        
+        clip_model, clip_preprocess = self._clip_model, self._clip_preprocess
+
         if clip_model is None or clip_preprocess is None:
-            print("Warning: CLIP model not available, using fallback score")
+            logger.warning("CLIP model not available, using fallback score")
             return 6.0
-        
+
         try:
-            # Load and preprocess image for CLIP
-            image = Image.open(image_path)
-            image_input = clip_preprocess(image).unsqueeze(0).to(model_loader.device)
-            
-            # Get occasion context
-            occasion_context = self.occasions[occasion]
-            
-            # Create context-specific prompts
-            prompts = [
-                f"professional outfit suitable for {occasion_context}",
-                f"appropriate and stylish attire for {occasion_context}",
-                f"well-dressed and coordinated for {occasion_context}",
-                f"fashionable look perfect for {occasion_context}"
-            ]
-            
-            # Calculate similarities
-            similarities = []
-            with torch.no_grad():
-                image_features = clip_model.encode_image(image_input)
-                image_features = image_features / image_features.norm(dim=-1, keepdim=True)
-                
-                for prompt in prompts:
-                    text_tokens = clip.tokenize([prompt]).to(model_loader.device)
-                    text_features = clip_model.encode_text(text_tokens)
-                    text_features = text_features / text_features.norm(dim=-1, keepdim=True)
-                    
-                    similarity = (image_features @ text_features.T).item()
-                    similarities.append(similarity)
-            
+            image_features = self._get_image_features(
+                pil_image, clip_model, clip_preprocess, image_key
+            )
+
+            # Cached text features for this occasion's fixed prompts
+            text_features = self._get_occasion_text_features(occasion, clip_model)
+
+            with torch.inference_mode():
+                similarities = (image_features @ text_features.T).squeeze(0)
+
             # Convert best similarity to 0-10 scale
-            best_similarity = max(similarities)
+            best_similarity = similarities.max().item()
             clip_score = (best_similarity + 1) / 2 * 10
-            
+
             return min(max(clip_score, 0), 10)
-            
+
         except Exception as e:
-            print(f"Error in CLIP scoring: {e}")
+            logger.exception("Error in CLIP scoring")
             return 6.0
     
     def _calculate_color_harmony_score(self, all_colors: List[Dict]) -> float:
@@ -269,19 +455,19 @@ class OutfitAnalyzer:
     
     def _has_clashing_colors(self, color_names: List[str]) -> bool:
         """Check for potentially clashing color combinations"""
-        # Simple clash detection
-        warm_colors = {'red', 'orange', 'yellow', 'pink'}
-        cool_colors = {'blue', 'green', 'purple', 'teal', 'navy'}
-        
-        warm_count = sum(1 for color in color_names if color in warm_colors)
-        cool_count = sum(1 for color in color_names if color in cool_colors)
-        
-        # Too many warm and cool colors mixed
-        return warm_count > 1 and cool_count > 1
+        # Simple clash detection: too many warm and cool colors mixed.
+        # Set intersections against the class-level frozensets replace
+        # two generator passes with C-level set ops; callers pass unique
+        # names, so cardinality matches the old per-occurrence counts.
+        colors = set(color_names)
+        return (len(colors & self._WARM_COLORS) > 1
+                and len(colors & self._COOL_COLORS) > 1)
     
     def _calculate_completeness_score(self, detections: List[Dict], occasion: str) -> float:
         """Score based on having appropriate items for the occasion"""
-        items = [d['class'] for d in detections]
+        # One set build up front: every rule below is then an O(1) hash
+        # probe instead of a linear scan of the detection list
+        items = {d['class'] for d in detections}
         score = 5.0
         
         if occasion in ['job_interview', 'work_meeting', 'business_casual']:
@@ -315,7 +501,7 @@ class OutfitAnalyzer:
                 
         else:
             # General casual occasions
-            if len(items) >= 2:
+            if len(detections) >= 2:
                 score += 1.0
             if 'shoe' in items:
                 score += 0.5
@@ -324,14 +510,11 @@ class OutfitAnalyzer:
     
     def _calculate_coherence_score(self, detections: List[Dict], occasion: str) -> float:
         """Score based on style consistency"""
-        items = [d['class'] for d in detections]
+        items = {d['class'] for d in detections}
         score = 7.0
         
-        formal_items = ['jacket', 'shirt']
-        casual_items = ['shorts', 'sunglass']
-        
-        has_formal = any(item in items for item in formal_items)
-        has_casual = any(item in items for item in casual_items)
+        has_formal = not items.isdisjoint(self._FORMAL_ITEMS)
+        has_casual = not items.isdisjoint(self._CASUAL_ITEMS)
         
         # Check for style mismatches
         if occasion in ['job_interview', 'work_meeting', 'formal_event']:
@@ -347,13 +530,16 @@ class OutfitAnalyzer:
     
     def _calculate_final_score(self, scores: Dict) -> float:
         """Calculate weighted final score"""
-        final_score = (
-            self.scoring_weights['clip_contextual'] * scores['clip_score'] +
-            self.scoring_weights['color_harmony'] * scores['color_harmony'] +
-            self.scoring_weights['item_completeness'] * scores['completeness'] +
-            self.scoring_weights['style_coherence'] * scores['coherence']
-        )
-        
+        # Component order matches config.SCORE_COMPONENT_ORDER
+        components = np.asarray([
+            scores['clip_score'],
+            scores['color_harmony'],
+            scores['completeness'],
+            scores['coherence']
+        ], dtype=np.float32)
+
+        final_score = float(SCORING_WEIGHTS_VEC @ components)
+
         return min(max(final_score, 0), 10)
     
     def _generate_feedback(self, final_score: float, occasion: str) -> str:
@@ -371,4 +557,4 @@ class OutfitAnalyzer:
     
     def cleanup(self):
         """Clean up resources"""
-        self.color_detector.cleanup_all_temp_files()
\ No newline at end of file
+        # Color extraction is fully in-memory now; nothing to remove
\ No newline at end of file
@@ -3,8 +3,14 @@ Services package for shared services
 """
 
 from .model_loader import ModelLoader, model_loader
+from .analysis_cache import AnalysisCache, analysis_cache
+from .suggestion_cache import SuggestionCache, suggestion_cache
 
 __all__ = [
     'ModelLoader',
-    'model_loader'
+    'model_loader',
+    'AnalysisCache',
+    'analysis_cache',
+    'SuggestionCache',
+    'suggestion_cache'
 ]
\ No newline at end of file
@@ -0,0 +1,89 @@
+"""
+In-memory response cache for outfit analysis results
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Optional
+
+
+class AnalysisCache:
+    """LRU cache of analysis results keyed by upload content + parameters
+
+    Identical re-submissions (same image bytes, occasion, and preferences)
+    skip the whole YOLO/CLIP/LLM pipeline and return the stored result in
+    milliseconds.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: int = 86400):
+        """Initialize analysis cache"""
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key_from_digest(digest: str, occasion: str,
+                             include_suggestions: bool,
+                             user_preferences: Optional[Dict] = None) -> str:
+        """Build a stable cache key from a precomputed content digest"""
+        prefs = ""
+        if user_preferences:
+            prefs = "|".join(
+                f"{k}={user_preferences[k]}" for k in sorted(user_preferences)
+            )
+        return f"{digest}:{occasion}:{int(include_suggestions)}:{prefs}"
+
+    @classmethod
+    def make_key(cls, file_content: bytes, occasion: str,
+                 include_suggestions: bool,
+                 user_preferences: Optional[Dict] = None) -> str:
+        """Build a stable cache key from the upload bytes and parameters"""
+        digest = hashlib.sha256(file_content).hexdigest()
+        return cls.make_key_from_digest(
+            digest, occasion, include_suggestions, user_preferences
+        )
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return a cached result, or None on miss/expiry"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            result, stored_at = entry
+            if time.time() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def set(self, key: str, result: Dict) -> None:
+        """Store a result, evicting the oldest entry when full"""
+        with self._lock:
+            self._entries[key] = (result, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_stats(self) -> Dict:
+        """Get cache statistics"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+# Global analysis cache instance
+analysis_cache = AnalysisCache()
@@ -2,18 +2,36 @@
 Model loading and initialization service
 """
 
+import asyncio
+import functools
 import torch
 import clip
 import google.generativeai as genai
 from ultralytics import YOLO
 from typing import Optional, Tuple, Any
+import logging
 import os
 
 from app.config import (
-    MODEL_PATH, GEMINI_API_KEY, CLIP_MODEL_NAME, 
+    MODEL_PATH_STR, get_gemini_api_key, CLIP_MODEL_NAME,
     GEMINI_MODEL_NAME, CLASS_NAMES
 )
 
+# Child of the app logger configured in main.py (queue-backed handlers)
+logger = logging.getLogger("outfit_evaluator.models")
+
+
+@functools.lru_cache(maxsize=None)
+def _load_clip_cached(model_name: str, device: str):
+    """Load CLIP once per (model, device) pair.
+
+    clip.load re-reads the ViT checkpoint from disk and rebuilds the
+    model on every call; memoizing here makes repeat loads — autoreload,
+    a second ModelLoader in tests, reload after unload — return the
+    already-constructed instance. unload_models clears this cache.
+    """
+    return clip.load(model_name, device=device)
+
 class ModelLoader:
     """Handles loading and initialization of all AI models"""
     
@@ -25,7 +43,7 @@ class ModelLoader:
         self.gemini_model: Optional[Any] = None
         self.device: str = "cuda" if torch.cuda.is_available() else "cpu"
         
-        print(f"Model loader initialized. Device: {self.device}")
+        logger.info("Model loader initialized. Device: %s", self.device)
     
     def load_yolo_model(self) -> bool:
         """
@@ -35,18 +53,18 @@ class ModelLoader:
             bool: True if successful, False otherwise
         """
         try:
-            print(f"Loading YOLO model from: {MODEL_PATH}")
-            
-            if not os.path.exists(MODEL_PATH):
-                print(f"Error: Model file not found at {MODEL_PATH}")
+            logger.info("Loading YOLO model from: %s", MODEL_PATH_STR)
+
+            if not os.path.exists(MODEL_PATH_STR):
+                logger.error("Model file not found at %s", MODEL_PATH_STR)
                 return False
-            
-            self.yolo_model = YOLO(str(MODEL_PATH))
-            print("YOLO model loaded successfully")
+
+            self.yolo_model = YOLO(MODEL_PATH_STR)
+            logger.info("YOLO model loaded successfully")
             return True
             
         except Exception as e:
-            print(f"Error loading YOLO model: {e}")
+            logger.exception("Error loading YOLO model")
             return False
     
     def load_clip_model(self) -> bool:
@@ -57,18 +75,17 @@ class ModelLoader:
             bool: True if successful, False otherwise
         """
         try:
-            print(f"Loading CLIP model: {CLIP_MODEL_NAME}")
+            logger.info("Loading CLIP model: %s", CLIP_MODEL_NAME)
             
-            self.clip_model, self.clip_preprocess = clip.load(
-                CLIP_MODEL_NAME, 
-                device=self.device
+            self.clip_model, self.clip_preprocess = _load_clip_cached(
+                CLIP_MODEL_NAME, self.device
             )
             
-            print(f"CLIP model loaded successfully on {self.device}")
+            logger.info("CLIP model loaded successfully on %s", self.device)
             return True
             
         except Exception as e:
-            print(f"Error loading CLIP model: {e}")
+            logger.exception("Error loading CLIP model")
             return False
     
     def load_gemini_model(self) -> bool:
@@ -79,23 +96,25 @@ class ModelLoader:
             bool: True if successful, False otherwise
         """
         try:
-            if not GEMINI_API_KEY or GEMINI_API_KEY == "your-gemini-api-key-here":
-                print("Warning: Gemini API key not configured")
+            try:
+                api_key = get_gemini_api_key()
+            except RuntimeError as e:
+                logger.warning("%s", e)
                 return False
-            
-            print("Configuring Gemini model...")
-            
+
+            logger.info("Configuring Gemini model...")
+
             # Configure Gemini API
-            genai.configure(api_key=GEMINI_API_KEY)
+            genai.configure(api_key=api_key)
             
             # Initialize model
             self.gemini_model = genai.GenerativeModel(GEMINI_MODEL_NAME)
             
-            print("Gemini model configured successfully")
+            logger.info("Gemini model configured successfully")
             return True
             
         except Exception as e:
-            print(f"Error configuring Gemini model: {e}")
+            logger.exception("Error configuring Gemini model")
             return False
     
     def load_all_models(self) -> dict:
@@ -105,7 +124,7 @@ class ModelLoader:
         Returns:
             dict: Status of each model loading attempt
         """
-        print("Loading all models...")
+        logger.info("Loading all models...")
         
         status = {
             'yolo': self.load_yolo_model(),
@@ -113,17 +132,45 @@ class ModelLoader:
             'gemini': self.load_gemini_model()
         }
         
-        # Summary
+        self._log_load_summary(status)
+        
+        return status
+    
+    async def load_all_models_async(self) -> dict:
+        """
+        Load all models concurrently and return status
+        
+        The three loads are independent — YOLO and CLIP read separate
+        weight files, Gemini only configures an HTTP client — so running
+        them on worker threads brings startup wall time down to the
+        slowest load instead of the sum of all three.
+        
+        Returns:
+            dict: Status of each model loading attempt
+        """
+        logger.info("Loading all models...")
+        
+        yolo_ok, clip_ok, gemini_ok = await asyncio.gather(
+            asyncio.to_thread(self.load_yolo_model),
+            asyncio.to_thread(self.load_clip_model),
+            asyncio.to_thread(self.load_gemini_model)
+        )
+        status = {'yolo': yolo_ok, 'clip': clip_ok, 'gemini': gemini_ok}
+        
+        self._log_load_summary(status)
+        
+        return status
+    
+    def _log_load_summary(self, status: dict) -> None:
+        """Log the per-model outcome of a load pass"""
         successful = sum(status.values())
         total = len(status)
         
-        print(f"Model loading complete: {successful}/{total} successful")
+        logger.info("Model loading complete: %d/%d successful", successful, total)
         
         for model_name, success in status.items():
             status_text = "✅" if success else "❌"
-            print(f"  {model_name.upper()}: {status_text}")
-        
-        return status
+            logger.info("  %s: %s", model_name.upper(), status_text)
     
     def get_models(self) -> Tuple[Optional[YOLO], Optional[Any], Optional[Any], Optional[Any]]:
         """
@@ -174,19 +221,78 @@ class ModelLoader:
     
     def unload_models(self) -> None:
         """Unload all models to free memory"""
-        print("Unloading models...")
+        logger.info("Unloading models...")
         
         # Clear CUDA cache if using GPU
         if self.device == "cuda":
             torch.cuda.empty_cache()
         
+        # Drop the memoized CLIP load so a later reload actually frees
+        # and re-reads the weights
+        _load_clip_cached.cache_clear()
+        
         # Reset model references
         self.yolo_model = None
         self.clip_model = None
         self.clip_preprocess = None
         self.gemini_model = None
         
-        print("Models unloaded successfully")
+        logger.info("Models unloaded successfully")
+
+def configure_thread_limits() -> None:
+    """
+    Cap native thread pools before inference starts
+
+    torch, OpenCV, and the BLAS libraries each default to one thread per
+    core; stacked on top of the server's own concurrency they oversubscribe
+    the CPU and spend time context-switching instead of computing. Called
+    once at startup, before any model runs.
+    """
+    try:
+        cpu_count = os.cpu_count() or 1
+        threads = max(1, cpu_count // 2)
+
+        # BLAS/OpenMP pools honor these only if set before first use
+        os.environ.setdefault("OMP_NUM_THREADS", str(threads))
+        os.environ.setdefault("MKL_NUM_THREADS", str(threads))
+
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+
+        # Input shapes are fixed (640 letterbox for YOLO, 224 for CLIP),
+        # so cuDNN's one-time algorithm search pays off — and the startup
+        # warmup runs it before the first real request
+        if torch.cuda.is_available():
+            torch.backends.cudnn.benchmark = True
+
+        # OpenCV's internal pool: the app parallelizes across requests,
+        # not within a single cv2 call
+        import cv2
+        cv2.setNumThreads(1)
+
+        logger.info("Thread limits configured: %d compute threads", threads)
+
+    except Exception as e:
+        logger.warning("Could not configure thread limits: %s", e)
+
 
 # Global model loader instance
-model_loader = ModelLoader()
\ No newline at end of file
+model_loader = ModelLoader()
+
+
+def get_yolo_model() -> Optional[YOLO]:
+    """Return the YOLO model, loading it on first use.
+
+    Lazy fallback for contexts that never ran the startup event
+    (scripts, tests); the loaded handle is memoized on the loader.
+    """
+    if model_loader.yolo_model is None:
+        model_loader.load_yolo_model()
+    return model_loader.yolo_model
+
+
+def get_clip_model() -> Tuple[Optional[Any], Optional[Any]]:
+    """Return (clip_model, clip_preprocess), loading them on first use."""
+    if model_loader.clip_model is None:
+        model_loader.load_clip_model()
+    return model_loader.clip_model, model_loader.clip_preprocess
\ No newline at end of file
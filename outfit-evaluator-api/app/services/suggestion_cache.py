@@ -0,0 +1,94 @@
+"""
+In-memory cache for LLM-generated outfit suggestions
+"""
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Optional
+
+
+class SuggestionCache:
+    """LRU cache of Gemini suggestions keyed by the analysis semantics
+
+    The LLM call is the slowest and most expensive step of the pipeline,
+    yet different photos of similar outfits produce near-identical prompts.
+    Keys are built from what the prompt actually depends on — occasion,
+    the detected item classes with their colors, the rounded score, and
+    user preferences — deliberately ignoring per-image noise such as
+    bounding boxes and confidence decimals, so similar analyses share one
+    LLM response.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: int = 86400):
+        """Initialize suggestion cache"""
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(analysis_result: Dict,
+                 user_preferences: Optional[Dict] = None) -> str:
+        """Build a cache key from the semantic content of an analysis"""
+        items = sorted(
+            (
+                item.get('class', ''),
+                tuple(sorted(c.get('name', '') for c in item.get('colors', [])))
+            )
+            for item in analysis_result.get('detected_items', [])
+        )
+        key_material = {
+            'occasion': analysis_result.get('occasion', ''),
+            # Whole-point score buckets: a 7.3 and 7.4 outfit get the
+            # same advice, a 5 and an 8 don't
+            'score': round(analysis_result.get('style_score', 0)),
+            'items': items,
+            'preferences': user_preferences or {}
+        }
+        canonical = json.dumps(key_material, sort_keys=True, default=str)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return cached suggestion fields, or None on miss/expiry"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            suggestions, stored_at = entry
+            if time.time() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return suggestions
+
+    def set(self, key: str, suggestions: Dict) -> None:
+        """Store suggestion fields, evicting the oldest entry when full"""
+        with self._lock:
+            self._entries[key] = (suggestions, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_stats(self) -> Dict:
+        """Get cache statistics"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+# Global suggestion cache instance
+suggestion_cache = SuggestionCache()
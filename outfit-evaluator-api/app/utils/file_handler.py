@@ -2,8 +2,11 @@
 File handling utilities for image uploads and processing
 """
 
+import hashlib
+import logging
 import os
 import shutil
+import time
 from pathlib import Path
 from typing import Optional, Tuple
 from datetime import datetime
@@ -11,7 +14,57 @@ import uuid
 from PIL import Image
 import mimetypes
 
-from app.config import UPLOAD_DIR, MAX_FILE_SIZE, ALLOWED_EXTENSIONS, ALLOWED_MIME_TYPES
+from app.config import (
+    UPLOAD_DIR, MAX_FILE_SIZE, ALLOWED_EXTENSIONS, ALLOWED_MIME_TYPES,
+    is_allowed_upload
+)
+
+# Child of the app logger configured in main.py (queue-backed handlers);
+# %-style args keep formatting lazy when a level is disabled
+logger = logging.getLogger("outfit_evaluator.files")
+
+# Error-message suffix built once; the sort + join ran per rejection
+_ALLOWED_EXT_STR = ', '.join(sorted(ALLOWED_EXTENSIONS))
+
+# Suffix -> MIME type for the formats uploads can actually have;
+# mimetypes.guess_type walks the stdlib's full type tables per call
+_EXT_TO_MIME = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.bmp': 'image/bmp',
+}
+
+# Magic-number prefixes for the supported image formats
+_IMAGE_MAGIC_PREFIXES = (
+    b'\xff\xd8\xff',   # JPEG
+    b'\x89PNG',        # PNG
+    b'GIF87a',         # GIF
+    b'GIF89a',
+    b'BM',             # BMP
+)
+
+
+def is_image_magic(head: bytes) -> bool:
+    """Cheap magic-number sniff on the first bytes of an upload"""
+    return head.startswith(_IMAGE_MAGIC_PREFIXES)
+
+
+def average_hash(img: Image.Image, hash_size: int = 8) -> str:
+    """64-bit average perceptual hash of an already-decoded image
+
+    Operates on an open PIL image so callers that have just decoded the
+    upload get the hash without a second decode. Near-identical images
+    (recompressed, slightly resized) produce the same or close hashes.
+    """
+    small = img.convert('L').resize((hash_size, hash_size), Image.Resampling.LANCZOS)
+    pixels = list(small.getdata())
+    avg = sum(pixels) / len(pixels)
+    bits = 0
+    for pixel in pixels:
+        bits = (bits << 1) | (pixel > avg)
+    return f"{bits:0{hash_size * hash_size // 4}x}"
 
 class FileHandler:
     """Handles file upload, validation, and cleanup operations"""
@@ -19,9 +72,9 @@ class FileHandler:
     def __init__(self):
         """Initialize file handler"""
         self.upload_dir = Path(UPLOAD_DIR)
-        self.upload_dir.mkdir(exist_ok=True)
+        self.upload_dir.mkdir(parents=True, exist_ok=True)
         
-        print(f"FileHandler initialized. Upload directory: {self.upload_dir}")
+        logger.info("FileHandler initialized. Upload directory: %s", self.upload_dir)
     
     def validate_file(self, file_content: bytes, filename: str, content_type: str) -> Tuple[bool, str]:
         """
@@ -42,17 +95,15 @@ class FileHandler:
             max_mb = MAX_FILE_SIZE / (1024 * 1024)
             return False, f"File too large: {size_mb:.1f}MB. Maximum allowed: {max_mb}MB"
         
-        # Check file extension
+        # Check file extension and MIME type in one precompiled call
         if not filename:
             return False, "No filename provided"
-        
-        file_extension = Path(filename).suffix.lower().lstrip('.')
-        if file_extension not in ALLOWED_EXTENSIONS:
-            return False, f"Invalid file type: .{file_extension}. Allowed: {', '.join(ALLOWED_EXTENSIONS)}"
-        
-        # Check MIME type
-        if content_type not in ALLOWED_MIME_TYPES:
-            return False, f"Invalid content type: {content_type}. Allowed: {', '.join(ALLOWED_MIME_TYPES)}"
+
+        if not is_allowed_upload(filename, content_type):
+            return False, (
+                f"Invalid file type or content type: {filename} ({content_type}). "
+                f"Allowed extensions: {_ALLOWED_EXT_STR}"
+            )
         
         # Try to open as image to verify it's a valid image
         try:
@@ -64,6 +115,120 @@ class FileHandler:
         
         return True, "Valid file"
     
+    def save_upload_stream(self, fileobj, original_filename: str,
+                           max_size: int = MAX_FILE_SIZE) -> Tuple[bool, str, Optional[str], Optional[str]]:
+        """
+        Stream an uploaded file object to disk in chunks
+
+        Avoids buffering the whole upload in memory; the content hash and
+        size are computed on the fly and the size cap is enforced while
+        writing, so an oversized body never fully lands on disk.
+
+        Args:
+            fileobj: Binary file-like object positioned at the start
+            original_filename: Original filename
+            max_size: Maximum number of bytes to accept
+
+        Returns:
+            Tuple of (success, message, file_path, content_sha256)
+        """
+        file_path = None
+        try:
+            unique_filename = self._generate_unique_filename(original_filename)
+            file_path = self.upload_dir / unique_filename
+
+            hasher = hashlib.sha256()
+            size = 0
+
+            with open(file_path, 'wb') as f:
+                while chunk := fileobj.read(1024 * 1024):
+                    size += len(chunk)
+                    if size > max_size:
+                        f.close()
+                        os.remove(file_path)
+                        max_mb = max_size / (1024 * 1024)
+                        return False, f"File too large. Maximum allowed: {max_mb}MB", None, None
+                    hasher.update(chunk)
+                    f.write(chunk)
+
+            if size == 0:
+                os.remove(file_path)
+                return False, "Empty file", None, None
+
+            logger.debug("File saved: %s", file_path)
+            return True, "File saved successfully", str(file_path), hasher.hexdigest()
+
+        except Exception as e:
+            if file_path and os.path.exists(file_path):
+                os.remove(file_path)
+            return False, f"Error saving file: {str(e)}", None, None
+
+    def validate_and_optimize(self, file_path: str, filename: str, content_type: str,
+                              max_width: int = 1024, max_height: int = 1024,
+                              quality: int = 85) -> Tuple[bool, str, Optional[str]]:
+        """
+        Validate and optimize a saved upload in a single decode pass
+
+        The separate validate-then-optimize flow decoded each image twice;
+        here one Image.open/load both proves the file is a real image and
+        provides the pixels for the resize, halving decode work per upload.
+
+        Args:
+            file_path: Path to the saved file
+            filename: Original filename
+            content_type: MIME content type
+            max_width: Maximum width in pixels
+            max_height: Maximum height in pixels
+            quality: JPEG quality (1-100)
+
+        Returns:
+            Tuple of (is_valid, error_message, perceptual_hash)
+        """
+        if not filename:
+            return False, "No filename provided", None
+
+        if not is_allowed_upload(filename, content_type):
+            return False, (
+                f"Invalid file type or content type: {filename} ({content_type}). "
+                f"Allowed extensions: {_ALLOWED_EXT_STR}"
+            ), None
+
+        try:
+            with Image.open(file_path) as img:
+                original_width, original_height = img.size
+
+                # Draft mode lets libjpeg decode straight to a fraction
+                # of full resolution when heavy downscaling is coming:
+                # the validating decode, the hash, and the resize all
+                # work on the smaller buffer. No-op for non-JPEG input.
+                img.draft('RGB', (max_width, max_height))
+
+                # Full decode doubles as validation: truncated or corrupt
+                # files raise here
+                img.load()
+
+                if img.mode in ('RGBA', 'P'):
+                    img = img.convert('RGB')
+
+                # Hash from the same decode that validates and resizes
+                phash = average_hash(img)
+
+                if original_width <= max_width and original_height <= max_height:
+                    return True, "Valid file", phash
+
+                # In-place aspect-preserving downscale; replaces the
+                # manual ratio arithmetic
+                img.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
+                img.save(file_path, 'JPEG', quality=quality, optimize=True)
+
+                logger.debug("Image optimized: %dx%d -> %dx%d",
+                             original_width, original_height, img.width, img.height)
+
+        except Exception as e:
+            return False, f"Invalid image file: {str(e)}", None
+
+        return True, "Valid file", phash
+
     def save_upload(self, file_content: bytes, original_filename: str) -> Tuple[bool, str, Optional[str]]:
         """
         Save uploaded file with unique filename
@@ -84,7 +249,7 @@ class FileHandler:
             with open(file_path, 'wb') as f:
                 f.write(file_content)
             
-            print(f"File saved: {file_path}")
+            logger.debug("File saved: %s", file_path)
             return True, "File saved successfully", str(file_path)
             
         except Exception as e:
@@ -92,20 +257,13 @@ class FileHandler:
     
     def _generate_unique_filename(self, original_filename: str) -> str:
         """Generate unique filename with timestamp and UUID"""
-        
-        # Get file extension
-        file_extension = Path(original_filename).suffix.lower()
-        
-        # Generate timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        
-        # Generate short UUID
-        unique_id = str(uuid.uuid4())[:8]
-        
-        # Combine for unique filename
-        unique_filename = f"{timestamp}_{unique_id}{file_extension}"
-        
-        return unique_filename
+        # time.strftime skips the datetime object, .hex skips the
+        # dashed-UUID string that was built just to slice 8 chars off
+        return (
+            f"{time.strftime('%Y%m%d_%H%M%S')}"
+            f"_{uuid.uuid4().hex[:8]}"
+            f"{Path(original_filename).suffix.lower()}"
+        )
     
     def cleanup_file(self, file_path: str) -> bool:
         """
@@ -118,14 +276,17 @@ class FileHandler:
             bool: True if successful
         """
         try:
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                print(f"Cleaned up file: {file_path}")
-                return True
-            return False
+            # Unlink directly and treat "already gone" as the miss case:
+            # the exists() pre-check cost a second full path resolution
+            # and raced with concurrent cleanup anyway
+            os.remove(file_path)
+            logger.debug("Cleaned up file: %s", file_path)
+            return True
             
+        except FileNotFoundError:
+            return False
         except Exception as e:
-            print(f"Error cleaning up file {file_path}: {e}")
+            logger.exception("Error cleaning up file %s", file_path)
             return False
     
     def cleanup_old_files(self, max_age_hours: int = 24) -> int:
@@ -139,24 +300,24 @@ class FileHandler:
             Number of files deleted
         """
         deleted_count = 0
-        current_time = datetime.now()
+        cutoff = time.time() - max_age_hours * 3600
         
         try:
-            for file_path in self.upload_dir.iterdir():
-                if file_path.is_file():
-                    # Get file modification time
-                    file_time = datetime.fromtimestamp(file_path.stat().st_mtime)
-                    age_hours = (current_time - file_time).total_seconds() / 3600
-                    
-                    if age_hours > max_age_hours:
-                        if self.cleanup_file(str(file_path)):
+            # scandir surfaces the type and stat data the kernel already
+            # returned with the directory listing; iterdir + Path.stat
+            # paid two extra syscalls per entry
+            with os.scandir(self.upload_dir) as entries:
+                for entry in entries:
+                    if entry.is_file(follow_symlinks=False) \
+                            and entry.stat().st_mtime < cutoff:
+                        if self.cleanup_file(entry.path):
                             deleted_count += 1
             
             if deleted_count > 0:
-                print(f"Cleaned up {deleted_count} old files")
+                logger.info("Cleaned up %d old files", deleted_count)
                 
         except Exception as e:
-            print(f"Error during cleanup: {e}")
+            logger.exception("Error during cleanup")
         
         return deleted_count
     
@@ -192,12 +353,15 @@ class FileHandler:
                 "created": datetime.fromtimestamp(file_stat.st_ctime).isoformat(),
                 "modified": datetime.fromtimestamp(file_stat.st_mtime).isoformat(),
                 "extension": file_path_obj.suffix.lower(),
-                "mime_type": mimetypes.guess_type(file_path)[0],
+                "mime_type": _EXT_TO_MIME.get(
+                    file_path_obj.suffix.lower(),
+                    mimetypes.guess_type(file_path)[0]
+                ),
                 "dimensions": dimensions
             }
             
         except Exception as e:
-            print(f"Error getting file info for {file_path}: {e}")
+            logger.exception("Error getting file info for %s", file_path)
             return None
     
     def optimize_image(self, file_path: str, max_width: int = 1024, max_height: int = 1024, quality: int = 85) -> bool:
@@ -215,36 +379,31 @@ class FileHandler:
         """
         try:
             with Image.open(file_path) as img:
-                # Convert to RGB if necessary (for JPEG compatibility)
-                if img.mode in ('RGBA', 'P'):
-                    img = img.convert('RGB')
-                
-                # Calculate new dimensions while maintaining aspect ratio
                 original_width, original_height = img.size
                 
                 if original_width <= max_width and original_height <= max_height:
                     # Image is already small enough
                     return True
                 
-                # Calculate scaling factor
-                width_ratio = max_width / original_width
-                height_ratio = max_height / original_height
-                scale_factor = min(width_ratio, height_ratio)
+                # Decode at reduced resolution where the codec supports
+                # it, then finish with an aspect-preserving downscale
+                img.draft('RGB', (max_width, max_height))
                 
-                new_width = int(original_width * scale_factor)
-                new_height = int(original_height * scale_factor)
+                # Convert to RGB if necessary (for JPEG compatibility)
+                if img.mode in ('RGBA', 'P'):
+                    img = img.convert('RGB')
                 
-                # Resize image
-                resized_img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+                img.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
                 
                 # Save optimized image
-                resized_img.save(file_path, 'JPEG', quality=quality, optimize=True)
+                img.save(file_path, 'JPEG', quality=quality, optimize=True)
                 
-                print(f"Image optimized: {original_width}x{original_height} -> {new_width}x{new_height}")
+                logger.debug("Image optimized: %dx%d -> %dx%d",
+                             original_width, original_height, img.width, img.height)
                 return True
                 
         except Exception as e:
-            print(f"Error optimizing image {file_path}: {e}")
+            logger.exception("Error optimizing image %s", file_path)
             return False
     
     def get_upload_stats(self) -> dict:
@@ -259,14 +418,14 @@ class FileHandler:
             total_size = 0
             file_types = {}
             
-            for file_path in self.upload_dir.iterdir():
-                if file_path.is_file():
-                    file_count += 1
-                    file_size = file_path.stat().st_size
-                    total_size += file_size
-                    
-                    extension = file_path.suffix.lower()
-                    file_types[extension] = file_types.get(extension, 0) + 1
+            with os.scandir(self.upload_dir) as entries:
+                for entry in entries:
+                    if entry.is_file(follow_symlinks=False):
+                        file_count += 1
+                        total_size += entry.stat().st_size
+                        
+                        extension = os.path.splitext(entry.name)[1].lower()
+                        file_types[extension] = file_types.get(extension, 0) + 1
             
             return {
                 "total_files": file_count,
@@ -276,7 +435,7 @@ class FileHandler:
             }
             
         except Exception as e:
-            print(f"Error getting upload stats: {e}")
+            logger.exception("Error getting upload stats")
             return {"error": str(e)}
 
 # Global file handler instance
@@ -0,0 +1,38 @@
+"""
+Gunicorn configuration for production deployments
+
+Run with:
+    gunicorn app.main:app -c gunicorn.conf.py
+
+Each worker loads its own copy of the YOLO and CLIP models, so the usual
+cpu_count * 2 + 1 worker formula would exhaust memory; worker count is
+capped and sized for the model footprint instead.
+"""
+
+import multiprocessing
+import os
+
+bind = f"{os.getenv('API_HOST', '0.0.0.0')}:{os.getenv('API_PORT', '8000')}"
+
+# One worker per pair of cores, capped: every worker holds a full model
+# set (~1-2 GB), and inference is already multi-threaded inside torch
+workers = int(os.getenv("GUNICORN_WORKERS",
+                        max(1, min(4, multiprocessing.cpu_count() // 2))))
+
+# Uvicorn's worker class brings uvloop and httptools when installed
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Model loading can take a while on cold start; don't kill workers for it
+timeout = 120
+graceful_timeout = 30
+
+# Recycle workers periodically to bound any slow memory growth from the
+# inference libraries; jitter avoids all workers restarting at once
+max_requests = 500
+max_requests_jitter = 50
+
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
+loglevel = "info"
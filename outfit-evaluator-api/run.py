@@ -44,15 +44,26 @@ def main():
         print("   Set your Gemini API key to enable AI suggestions.")
         print()
     
+    # Dev mode keeps the reloader and chatty logs; anything else runs
+    # production settings (no fs-polling watcher, quiet access log,
+    # optional multi-worker). Containerized deploys should prefer
+    # gunicorn.conf.py, which manages workers properly.
+    dev_mode = os.getenv("ENV", "dev") == "dev"
+    workers = 1 if dev_mode else int(os.getenv("UVICORN_WORKERS", "1"))
+    
     try:
         # Run the FastAPI app
         uvicorn.run(
             "app.main:app",
             host=API_HOST,
             port=API_PORT,
-            reload=True,  # Auto-reload on code changes (disable in production)
-            log_level="info",
-            access_log=True
+            reload=dev_mode,  # Auto-reload on code changes (dev only)
+            workers=workers,
+            log_level="info" if dev_mode else "warning",
+            access_log=dev_mode,
+            loop="auto",   # uvicorn picks uvloop where installed, asyncio elsewhere
+            http="auto",   # likewise httptools where installed, h11 elsewhere
+            limit_concurrency=64  # Backpressure: shed load instead of queueing unbounded
         )
         
     except KeyboardInterrupt: